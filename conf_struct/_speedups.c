@@ -0,0 +1,457 @@
+/*
+ * Optional C accelerator for ConfStructure.parse / ConfStructure.build.
+ *
+ * Only the header scan, the code dispatch and the header packing live here.
+ * Values are still unpacked with the field's struct.Struct object and every
+ * other field is handed back to Python, so the output is identical to the
+ * pure Python implementation in structures.py.
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#if PY_MAJOR_VERSION >= 3
+#define TEXT_FROM_FORMAT PyUnicode_FromFormat
+#else
+#define TEXT_FROM_FORMAT PyString_FromFormat
+#endif
+
+
+static unsigned PY_LONG_LONG
+read_uint(const unsigned char *p, Py_ssize_t size, int big_endian)
+{
+    unsigned PY_LONG_LONG x = 0;
+    Py_ssize_t i;
+
+    if (big_endian) {
+        for (i = 0; i < size; i++)
+            x = (x << 8) | p[i];
+    }
+    else {
+        for (i = size - 1; i >= 0; i--)
+            x = (x << 8) | p[i];
+    }
+    return x;
+}
+
+
+static void
+write_uint(unsigned char *p, unsigned PY_LONG_LONG x, Py_ssize_t size, int big_endian)
+{
+    Py_ssize_t i;
+
+    if (big_endian) {
+        for (i = size - 1; i >= 0; i--, x >>= 8)
+            p[i] = (unsigned char)(x & 0xff);
+    }
+    else {
+        for (i = 0; i < size; i++, x >>= 8)
+            p[i] = (unsigned char)(x & 0xff);
+    }
+}
+
+
+static unsigned PY_LONG_LONG
+uint_limit(Py_ssize_t size)
+{
+    return size == 8 ? ~0ULL : (1ULL << (8 * size)) - 1;
+}
+
+
+static int
+check_size(Py_ssize_t size, const char *name)
+{
+    if (size != 1 && size != 2 && size != 4 && size != 8) {
+        PyErr_Format(PyExc_ValueError, "unsupported %s size %zd", name, size);
+        return -1;
+    }
+    return 0;
+}
+
+
+static void
+raise_text(PyObject *error, PyObject *message)
+{
+    if (message != NULL) {
+        PyErr_SetObject(error, message);
+        Py_DECREF(message);
+    }
+}
+
+
+/*
+ * Dispatch one record body. ``entry`` is ``(name, unpack, single, field)``,
+ * ``unpack`` is None for fields which must be parsed by ``slow(field, body)``.
+ */
+static int
+store_value(PyObject *values, int use_setattr, PyObject *name, PyObject *value)
+{
+    if (PyDict_CheckExact(values))
+        return PyDict_SetItem(values, name, value);
+    if (use_setattr)
+        return PyObject_SetAttr(values, name, value);
+    return PyObject_SetItem(values, name, value);
+}
+
+
+static int
+parse_record(PyObject *values, int use_setattr, PyObject *entry, PyObject *body, PyObject *slow)
+{
+    PyObject *name, *unpack, *single, *field, *value;
+    int truth;
+
+    if (!PyTuple_Check(entry) || PyTuple_GET_SIZE(entry) != 4) {
+        PyErr_SetString(PyExc_TypeError, "lookup entries must be 4-tuples");
+        return -1;
+    }
+    name = PyTuple_GET_ITEM(entry, 0);
+    unpack = PyTuple_GET_ITEM(entry, 1);
+    single = PyTuple_GET_ITEM(entry, 2);
+    field = PyTuple_GET_ITEM(entry, 3);
+
+    if (unpack == Py_None) {
+        value = PyObject_CallFunctionObjArgs(slow, field, body, NULL);
+    }
+    else {
+        value = PyObject_CallFunctionObjArgs(unpack, body, NULL);
+        if (value != NULL && PyObject_IsTrue(single) == 1) {
+            PyObject *item;
+
+            if (!PyTuple_Check(value) || PyTuple_GET_SIZE(value) != 1) {
+                Py_DECREF(value);
+                PyErr_SetString(PyExc_ValueError, "too many values to unpack (expected 1)");
+                return -1;
+            }
+            item = PyTuple_GET_ITEM(value, 0);
+            Py_INCREF(item);
+            Py_DECREF(value);
+            value = item;
+        }
+    }
+    if (value == NULL)
+        return -1;
+
+    truth = PyObject_IsTrue(value);
+    if (truth > 0 && store_value(values, use_setattr, name, value) < 0)
+        truth = -1;
+    Py_DECREF(value);
+    return truth < 0 ? -1 : 0;
+}
+
+
+PyDoc_STRVAR(parse_doc,
+"parse(binary, code_size, length_size, big_endian, lookup, slow, error[, target, use_setattr]) -> dict\n\
+\n\
+Scan the \"code-length-body\" records of binary and parse every body.\n\
+Values are stored into target (by item or by attribute) instead of a new dict if it is given.");
+
+static PyObject *
+speedups_parse(PyObject *self, PyObject *args)
+{
+    PyObject *binary, *lookup, *slow, *error, *target = Py_None;
+    Py_ssize_t code_size, length_size, header_size, total, index;
+    int big_endian, use_setattr = 0;
+    Py_buffer view;
+    PyObject *values;
+
+    if (!PyArg_ParseTuple(args, "OnniO!OO|Oi:parse", &binary, &code_size, &length_size,
+                          &big_endian, &PyDict_Type, &lookup, &slow, &error, &target, &use_setattr))
+        return NULL;
+    if (check_size(code_size, "code") < 0 || check_size(length_size, "length") < 0)
+        return NULL;
+    if (PyObject_GetBuffer(binary, &view, PyBUF_SIMPLE) < 0)
+        return NULL;
+
+    if (target == Py_None) {
+        values = PyDict_New();
+        if (values == NULL)
+            goto fail;
+    }
+    else {
+        values = target;
+        Py_INCREF(values);
+    }
+
+    header_size = code_size + length_size;
+    total = view.len - header_size;
+    if (view.len != 0 && total <= 0) {
+        raise_text(error, TEXT_FROM_FORMAT("No enough binary"));
+        goto fail;
+    }
+
+    index = 0;
+    while (index <= total) {
+        const unsigned char *p = (const unsigned char *)view.buf + index;
+        unsigned PY_LONG_LONG code = read_uint(p, code_size, big_endian);
+        unsigned PY_LONG_LONG length = read_uint(p + code_size, length_size, big_endian);
+        Py_ssize_t start = index + header_size;
+        Py_ssize_t available = view.len - start;
+        PyObject *key, *entry, *body;
+        int rv;
+
+        if (length > (unsigned PY_LONG_LONG)available) {
+            raise_text(error, TEXT_FROM_FORMAT("No enough binary, expect %llu but %zd",
+                                               length, available));
+            goto fail;
+        }
+        key = PyLong_FromUnsignedLongLong(code);
+        if (key == NULL)
+            goto fail;
+        entry = PyDict_GetItem(lookup, key);
+        Py_DECREF(key);
+        if (entry == NULL) {
+            raise_text(error, TEXT_FROM_FORMAT("Invalid code %llu", code));
+            goto fail;
+        }
+        body = PySequence_GetSlice(binary, start, start + (Py_ssize_t)length);
+        if (body == NULL)
+            goto fail;
+        rv = parse_record(values, use_setattr, entry, body, slow);
+        Py_DECREF(body);
+        if (rv < 0)
+            goto fail;
+        index = start + (Py_ssize_t)length;
+    }
+
+    PyBuffer_Release(&view);
+    return values;
+
+fail:
+    PyBuffer_Release(&view);
+    Py_XDECREF(values);
+    return NULL;
+}
+
+
+/*
+ * A prepacked header is reused when the body has the size it was packed for,
+ * ``entry`` is ``(name, build, code, size, header)``.
+ */
+static int
+use_header(PyObject *entry, Py_ssize_t length)
+{
+    PyObject *size = PyTuple_GET_ITEM(entry, 3);
+    Py_ssize_t expected;
+
+    if (PyTuple_GET_ITEM(entry, 4) == Py_None || size == Py_None)
+        return 0;
+    expected = PyNumber_AsSsize_t(size, NULL);
+    if (expected == -1 && PyErr_Occurred()) {
+        PyErr_Clear();
+        return 0;
+    }
+    return expected == length;
+}
+
+
+static int
+read_code(PyObject *entry, unsigned PY_LONG_LONG limit, PyObject *error, unsigned PY_LONG_LONG *code)
+{
+    PyObject *obj = PyTuple_GET_ITEM(entry, 2);
+
+#if PY_MAJOR_VERSION < 3
+    if (PyInt_Check(obj)) {
+        long value = PyInt_AS_LONG(obj);
+
+        if (value < 0) {
+            PyErr_SetString(error, "code out of range");
+            return -1;
+        }
+        *code = (unsigned PY_LONG_LONG)value;
+    }
+    else
+#endif
+    {
+        *code = PyLong_AsUnsignedLongLong(obj);
+        if (*code == (unsigned PY_LONG_LONG)-1 && PyErr_Occurred()) {
+            if (!PyErr_ExceptionMatches(PyExc_OverflowError) && !PyErr_ExceptionMatches(PyExc_TypeError))
+                return -1;
+            PyErr_Clear();
+            PyErr_SetString(error, "code out of range");
+            return -1;
+        }
+    }
+    if (*code > limit) {
+        PyErr_SetString(error, "code out of range");
+        return -1;
+    }
+    return 0;
+}
+
+
+/*
+ * Copy a bytes-like body, anything else is rejected with TypeError like
+ * b''.join in the python builder.
+ */
+static PyObject *
+copy_buffer(PyObject *body)
+{
+    Py_buffer view;
+    PyObject *data;
+
+    if (!PyObject_CheckBuffer(body)) {
+        PyErr_Format(PyExc_TypeError, "expected a bytes-like object, %.200s found",
+                     Py_TYPE(body)->tp_name);
+        return NULL;
+    }
+    if (PyObject_GetBuffer(body, &view, PyBUF_SIMPLE) < 0)
+        return NULL;
+    data = PyBytes_FromStringAndSize((const char *)view.buf, view.len);
+    PyBuffer_Release(&view);
+    return data;
+}
+
+
+PyDoc_STRVAR(build_doc,
+"build(plan, values, code_size, length_size, big_endian, hook, error) -> bytes\n\
+\n\
+Walk the (name, build, code, size, header) entries of plan, build the body of\n\
+every name in values and concatenate the records. Prepacked headers are\n\
+reused, the others are packed here. hook(name, value) is called when the\n\
+field build returns None.");
+
+static PyObject *
+speedups_build(PyObject *self, PyObject *args)
+{
+    PyObject *plan, *values, *hook, *error, *seq, *entries = NULL, *bodies = NULL, *result = NULL;
+    Py_ssize_t code_size, length_size, header_size, n, i, size = 0;
+    unsigned PY_LONG_LONG code_limit, length_limit, code;
+    int big_endian;
+    unsigned char *out;
+
+    if (!PyArg_ParseTuple(args, "OO!nniOO:build", &plan, &PyDict_Type, &values, &code_size,
+                          &length_size, &big_endian, &hook, &error))
+        return NULL;
+    if (check_size(code_size, "code") < 0 || check_size(length_size, "length") < 0)
+        return NULL;
+    header_size = code_size + length_size;
+    code_limit = uint_limit(code_size);
+    length_limit = uint_limit(length_size);
+
+    seq = PySequence_Fast(plan, "plan must be a sequence");
+    if (seq == NULL)
+        return NULL;
+    n = PySequence_Fast_GET_SIZE(seq);
+    entries = PyList_New(0);
+    bodies = PyList_New(0);
+    if (entries == NULL || bodies == NULL)
+        goto done;
+
+    /* Build every body and check the headers before anything is written */
+    for (i = 0; i < n; i++) {
+        PyObject *entry = PySequence_Fast_GET_ITEM(seq, i);
+        PyObject *name, *value, *body, *data;
+        int truth, rv;
+
+        if (!PyTuple_Check(entry) || PyTuple_GET_SIZE(entry) != 5) {
+            PyErr_SetString(PyExc_TypeError, "plan entries must be 5-tuples");
+            goto done;
+        }
+        name = PyTuple_GET_ITEM(entry, 0);
+        value = PyDict_GetItem(values, name);
+        if (value == NULL)
+            continue;
+        body = PyObject_CallFunctionObjArgs(PyTuple_GET_ITEM(entry, 1), value, NULL);
+        if (body == Py_None) {
+            Py_DECREF(body);
+            body = PyObject_CallFunctionObjArgs(hook, name, value, NULL);
+        }
+        if (body == NULL)
+            goto done;
+        truth = PyObject_IsTrue(body);
+        if (truth <= 0) {
+            Py_DECREF(body);
+            if (truth < 0)
+                goto done;
+            continue;
+        }
+        if (PyBytes_Check(body)) {
+            data = body;
+        }
+        else {
+            data = copy_buffer(body);
+            Py_DECREF(body);
+            if (data == NULL)
+                goto done;
+        }
+        rv = PyList_Append(bodies, data);
+        Py_DECREF(data);
+        if (rv < 0 || PyList_Append(entries, entry) < 0)
+            goto done;
+
+        if (!use_header(entry, PyBytes_GET_SIZE(data))) {
+            if (read_code(entry, code_limit, error, &code) < 0)
+                goto done;
+            if ((unsigned PY_LONG_LONG)PyBytes_GET_SIZE(data) > length_limit) {
+                PyErr_SetString(error, "length out of range");
+                goto done;
+            }
+        }
+        size += header_size + PyBytes_GET_SIZE(data);
+    }
+
+    result = PyBytes_FromStringAndSize(NULL, size);
+    if (result == NULL)
+        goto done;
+    out = (unsigned char *)PyBytes_AS_STRING(result);
+
+    for (i = 0; i < PyList_GET_SIZE(bodies); i++) {
+        PyObject *entry = PyList_GET_ITEM(entries, i);
+        PyObject *body = PyList_GET_ITEM(bodies, i);
+        Py_ssize_t length = PyBytes_GET_SIZE(body);
+
+        if (use_header(entry, length)) {
+            memcpy(out, PyBytes_AS_STRING(PyTuple_GET_ITEM(entry, 4)), header_size);
+        }
+        else {
+            if (read_code(entry, code_limit, error, &code) < 0) {
+                Py_CLEAR(result);
+                goto done;
+            }
+            write_uint(out, code, code_size, big_endian);
+            write_uint(out + code_size, (unsigned PY_LONG_LONG)length, length_size, big_endian);
+        }
+        memcpy(out + header_size, PyBytes_AS_STRING(body), length);
+        out += header_size + length;
+    }
+
+done:
+    Py_XDECREF(entries);
+    Py_XDECREF(bodies);
+    Py_DECREF(seq);
+    return result;
+}
+
+
+static PyMethodDef speedups_methods[] = {
+    {"parse", speedups_parse, METH_VARARGS, parse_doc},
+    {"build", speedups_build, METH_VARARGS, build_doc},
+    {NULL, NULL, 0, NULL}
+};
+
+
+#if PY_MAJOR_VERSION >= 3
+
+static struct PyModuleDef speedups_module = {
+    PyModuleDef_HEAD_INIT,
+    "_speedups",
+    NULL,
+    -1,
+    speedups_methods
+};
+
+PyMODINIT_FUNC
+PyInit__speedups(void)
+{
+    return PyModule_Create(&speedups_module);
+}
+
+#else
+
+PyMODINIT_FUNC
+init_speedups(void)
+{
+    Py_InitModule("_speedups", speedups_methods);
+}
+
+#endif
@@ -6,11 +6,15 @@ import sys
 import operator
 import struct
 from functools import reduce
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 
 import six
 
 PY36 = sys.version_info[0:2] >= (3, 6)
+PY37 = sys.version_info[0:2] >= (3, 7)
+
+# dict keeps the insertion order since python 3.7
+_ordered_dict = dict if PY37 else OrderedDict
 
 
 # ----------Basic interface----------
@@ -168,9 +172,11 @@ class CDictionary(CSequence):
 
     def _parse(self, binary):
         values = self.struct.unpack(binary)
-        values = tuple(map(self._ensure_string, values))
-        nd = self._list2dict_class(*values)
-        values = self.post_parse(nd._asdict())
+        field_names = self._list2dict_class._fields
+        if len(values) != len(field_names):
+            raise TypeError('Expected {} values but {}'.format(len(field_names), len(values)))
+        values = _ordered_dict(zip(field_names, map(self._ensure_string, values)))
+        values = self.post_parse(values)
         return values
 
 
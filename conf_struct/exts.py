@@ -2,12 +2,122 @@
 
 from __future__ import unicode_literals
 
-from .constructors import CSequence
+import binascii
+import datetime
+import socket
+import struct
 
+from .constructors import CSingle, CSequence
+from .exceptions import BuildException, ParseException
 
-class CIPv4(CSequence):
+_PORT = struct.Struct('>H')
+_BYTE_HEX = ['{:02x}'.format(i) for i in range(256)]
+
+
+def _packed(value, size):
+    """Return the packed form of ipaddress.IPv4Address/IPv6Address objects."""
+    packed = getattr(value, 'packed', None)
+    if packed is not None and len(packed) == size:
+        return packed
+
+
+def _to_bytes(binary):
+    """bytes() of a memoryview is its repr on python 2."""
+    return binary.tobytes() if isinstance(binary, memoryview) else bytes(binary)
+
+
+class _ConversionCache(dict):
+    """A small bounded cache, it is cleared when full."""
+
+    def __init__(self, size):
+        super(_ConversionCache, self).__init__()
+        self.size = size
+
+    def put(self, key, value):
+        if len(self) >= self.size:
+            self.clear()
+        self[key] = value
+        return value
+
+
+class BatchConstructorMixin(object):
+    """
+    Optional conversion cache and batch API for fixed-size constructors.
+
+    A column is the concatenated binary of several values of the same constructor.
+    """
+
+    def __init__(self, cache_size=0, **kwargs):
+        super(BatchConstructorMixin, self).__init__(**kwargs)
+        self._build_cache = _ConversionCache(cache_size) if cache_size else None
+        self._parse_cache = _ConversionCache(cache_size) if cache_size else None
+
+    def build(self, value):
+        cache = self._build_cache
+        if cache is None:
+            return self._build(value)
+        try:
+            return cache[value]
+        except (KeyError, TypeError):
+            binary = self._build(value)
+            try:
+                return cache.put(value, binary)
+            except TypeError:
+                return binary
+
+    def parse(self, binary):
+        cache = self._parse_cache
+        if cache is None:
+            return self._parse(binary)
+        binary = _to_bytes(binary)
+        try:
+            return cache[binary]
+        except KeyError:
+            return cache.put(binary, self._parse(binary))
+
+    def build_many(self, values):
+        build = self.build
+        return b''.join([build(value) for value in values])
+
+    def parse_many(self, binary):
+        size = self.byte_size
+        if len(binary) % size:
+            raise ParseException('Column size {} is not a multiple of {}'.format(len(binary), size))
+        parse = self.parse
+        return [parse(binary[i:i + size]) for i in range(0, len(binary), size)]
+
+
+def _own_hooks(obj, cls):
+    """Return (pre_build, post_parse) flags, True if the hook of obj is not overridden from cls."""
+    return type(obj).pre_build == cls.pre_build, type(obj).post_parse == cls.post_parse
+
+
+class CIPv4(BatchConstructorMixin, CSequence):
     def __init__(self, **kwargs):
         super(CIPv4, self).__init__(format='>4B', **kwargs)
+        self._fast_build, self._fast_parse = _own_hooks(self, CIPv4)
+
+    def _build(self, value):
+        if self._fast_build:
+            packed = _packed(value, 4)
+            if packed is not None:
+                return packed
+            try:
+                return socket.inet_pton(socket.AF_INET, value)
+            except (socket.error, ValueError, TypeError):
+                pass
+        return super(CIPv4, self)._build(value)
+
+    def _parse(self, binary):
+        if not self._fast_parse or len(binary) != 4:
+            return super(CIPv4, self)._parse(binary)
+        return socket.inet_ntoa(binary)
+
+    def parse_many(self, binary):
+        if not self._fast_parse or self._parse_cache is not None or len(binary) % 4:
+            return super(CIPv4, self).parse_many(binary)
+        ntoa = socket.inet_ntoa
+        return [ntoa(binary[i:i + 4]) for i in range(0, len(binary), 4)]
 
     def pre_build(self, value):
         return list(map(int, value.split('.')))
@@ -16,9 +126,25 @@ class CIPv4(CSequence):
         return '{0}.{1}.{2}.{3}'.format(*value)
 
 
-class CIPv4Port(CSequence):
+class CIPv4Port(BatchConstructorMixin, CSequence):
     def __init__(self, **kwargs):
         super(CIPv4Port, self).__init__(format='>4BH', **kwargs)
+        self._fast_build, self._fast_parse = _own_hooks(self, CIPv4Port)
+
+    def _build(self, value):
+        if self._fast_build:
+            try:
+                ip, port = value.split(':')
+                return socket.inet_pton(socket.AF_INET, ip) + _PORT.pack(int(port))
+            except (socket.error, ValueError, TypeError, struct.error):
+                pass
+        return super(CIPv4Port, self)._build(value)
+
+    def _parse(self, binary):
+        if not self._fast_parse or len(binary) != 6:
+            return super(CIPv4Port, self)._parse(binary)
+        port, = _PORT.unpack_from(binary, 4)
+        return '{}:{}'.format(socket.inet_ntoa(binary[:4]), port)
 
     def pre_build(self, value):
         ip, port = value.split(':')
@@ -26,3 +152,69 @@ class CIPv4Port(CSequence):
 
     def post_parse(self, value):
         return '{0}.{1}.{2}.{3}:{4}'.format(*value)
+
+
+class CIPv6(BatchConstructorMixin, CSingle):
+    def __init__(self, **kwargs):
+        super(CIPv6, self).__init__(format='16s', **kwargs)
+
+    def _build(self, value):
+        packed = _packed(value, 16)
+        if packed is not None:
+            return packed
+        try:
+            return socket.inet_pton(socket.AF_INET6, value)
+        except (socket.error, ValueError, TypeError) as e:
+            raise BuildException('Invalid IPv6 address {!r}: {}'.format(value, e))
+
+    def _parse(self, binary):
+        if len(binary) != 16:
+            raise ParseException('IPv6 address requires 16 bytes but {}'.format(len(binary)))
+        return socket.inet_ntop(socket.AF_INET6, _to_bytes(binary))
+
+
+class CMac(BatchConstructorMixin, CSingle):
+    """MAC address like 'aa:bb:cc:dd:ee:ff', '-' is also accepted as separator for build."""
+
+    def __init__(self, **kwargs):
+        super(CMac, self).__init__(format='6s', **kwargs)
+
+    def _build(self, value):
+        try:
+            binary = binascii.unhexlify(value.replace(':', '').replace('-', ''))
+        except (binascii.Error, TypeError, ValueError) as e:
+            raise BuildException('Invalid MAC address {!r}: {}'.format(value, e))
+        if len(binary) != 6:
+            raise BuildException('Invalid MAC address {!r}'.format(value))
+        return binary
+
+    def _parse(self, binary):
+        if len(binary) != 6:
+            raise ParseException('MAC address requires 6 bytes but {}'.format(len(binary)))
+        return ':'.join(map(_BYTE_HEX.__getitem__, bytearray(binary)))
+
+
+class CBCDTimestamp(BatchConstructorMixin, CSingle):
+    """A datetime stored as 6 BCD bytes: YY MM DD hh mm ss, years start from base_year."""
+
+    def __init__(self, base_year=2000, **kwargs):
+        super(CBCDTimestamp, self).__init__(format='6s', **kwargs)
+        self.base_year = base_year
+
+    def _build(self, value):
+        year = value.year - self.base_year
+        if not 0 <= year <= 99:
+            raise BuildException('Year {} out of range for base year {}'.format(value.year, self.base_year))
+        digits = '{:02d}{:02d}{:02d}{:02d}{:02d}{:02d}'.format(
+            year, value.month, value.day, value.hour, value.minute, value.second)
+        return binascii.unhexlify(digits.encode('ascii'))
+
+    def _parse(self, binary):
+        if len(binary) != 6:
+            raise ParseException('BCD timestamp requires 6 bytes but {}'.format(len(binary)))
+        digits = binascii.hexlify(binary).decode('ascii')
+        try:
+            return datetime.datetime(self.base_year + int(digits[0:2]), int(digits[2:4]), int(digits[4:6]),
+                                     int(digits[6:8]), int(digits[8:10]), int(digits[10:12]))
+        except ValueError as e:
+            raise ParseException('Invalid BCD timestamp {}: {}'.format(digits, e))
@@ -8,10 +8,15 @@ from .constructors import CSingle, CSequence, CDictionary
 
 
 class CFieldBase(object):
+    # Tracks each time a field instance is created, used to retain the declaration order in ConfStructure.
+    creation_counter = 0
+
     def __init__(self, code, constructor=None, label=None, **kwargs):
         self.code = code
         self.constructor = constructor
         self.label = label
+        self.creation_counter = CFieldBase.creation_counter
+        CFieldBase.creation_counter += 1
 
     @property
     def has_constructor(self):
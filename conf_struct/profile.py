@@ -0,0 +1,283 @@
+# coding=utf8
+"""
+Replay a capture of frames through a ConfStructure and report its performance.
+
+Usage:
+
+    python -m conf_struct.profile myapp.protocols:DeviceConfStructure capture.txt
+    python -m conf_struct.profile myapp.protocols.DeviceConfStructure capture.bin --format binary
+
+A capture in ``hex`` format contains one frame per line as hex digits, blank lines and lines starting
+with ``#`` are ignored. A capture in ``binary`` format is a sequence of frames, each one is prefixed by
+its length as a 4-byte big-endian unsigned integer.
+"""
+from __future__ import unicode_literals, print_function
+
+import argparse
+import binascii
+import cProfile
+import importlib
+import io
+import pstats
+import struct
+import sys
+from collections import namedtuple
+from timeit import default_timer
+
+try:
+    import tracemalloc
+except ImportError:  # python 2
+    tracemalloc = None
+
+from .exceptions import ParseException
+
+_FRAME_LENGTH = struct.Struct('>I')
+
+
+# ---------- Loading ----------
+
+def load_structure(path):
+    """Return an instance of the ConfStructure subclass named by 'package.module:Class' or 'package.module.Class'."""
+    if ':' in path:
+        module_name, class_name = path.split(':', 1)
+    else:
+        module_name, _, class_name = path.rpartition('.')
+    if not module_name:
+        raise ValueError('Invalid structure path {}'.format(path))
+    obj = importlib.import_module(module_name)
+    for name in class_name.split('.'):
+        obj = getattr(obj, name)
+    return obj()
+
+
+def read_hex_frames(fp):
+    frames = []
+    for lineno, line in enumerate(fp, 1):
+        line = line.strip()
+        if isinstance(line, bytes):
+            line = line.decode('ascii', 'replace')
+        if line and not line.startswith('#'):
+            try:
+                frames.append(binascii.unhexlify(''.join(line.split())))
+            except (binascii.Error, TypeError, ValueError) as e:
+                raise ParseException('Invalid hex frame at line {}: {}'.format(lineno, e))
+    return frames
+
+
+def read_binary_frames(fp):
+    frames = []
+    while True:
+        header = fp.read(_FRAME_LENGTH.size)
+        if not header:
+            break
+        if len(header) != _FRAME_LENGTH.size:
+            raise ParseException('Truncated frame length prefix')
+        length, = _FRAME_LENGTH.unpack(header)
+        frame = fp.read(length)
+        if len(frame) != length:
+            raise ParseException('Truncated frame, expect {} but {}'.format(length, len(frame)))
+        frames.append(frame)
+    return frames
+
+
+def read_frames(filename, format='hex'):
+    with io.open(filename, 'rb') as fp:
+        if format == 'hex':
+            return read_hex_frames(fp)
+        return read_binary_frames(fp)
+
+
+# ---------- Measurement ----------
+
+def _parse_all(structure, frames):
+    values_list = []
+    errors = 0
+    for frame in frames:
+        try:
+            values_list.append(structure.parse(frame))
+        except Exception:
+            errors += 1
+    return values_list, errors
+
+
+def _build_all(structure, values_list):
+    for values in values_list:
+        structure.build(**values)
+
+
+def measure_throughput(structure, frames, values_list, repeat=3):
+    """Return best-of-repeat (parse_seconds, build_seconds) for the whole capture."""
+    parse_times, build_times = [], []
+    for _ in range(repeat):
+        start = default_timer()
+        _parse_all(structure, frames)
+        parse_times.append(default_timer() - start)
+        start = default_timer()
+        _build_all(structure, values_list)
+        build_times.append(default_timer() - start)
+    return min(parse_times), min(build_times)
+
+
+def field_breakdown(structure, frames, values_list):
+    """Return {field name: [count, parse_seconds, build_seconds]}."""
+    stats = {}
+    header_size = structure.opts.size
+    for frame in frames:
+        try:
+            records = structure._scan_records(frame)
+        except ParseException:
+            continue
+        for code, record_start, record_end in records:
+            field = structure.code_lookup[code]
+            value_binary = frame[record_start + header_size:record_end]
+            start = default_timer()
+            try:
+                structure._parse_field(field, value_binary)
+            except Exception:
+                pass
+            elapsed = default_timer() - start
+            item = stats.setdefault(field.name, [0, 0.0, 0.0])
+            item[0] += 1
+            item[1] += elapsed
+    for values in values_list:
+        for name, value in values.items():
+            field = structure.name_lookup.get(name)
+            if field is None:
+                continue
+            start = default_timer()
+            structure._build_field(field, value)
+            stats.setdefault(name, [0, 0.0, 0.0])[2] += default_timer() - start
+    return stats
+
+
+AllocationStats = namedtuple('AllocationStats', [
+    'peak_bytes', 'result_blocks', 'result_bytes', 'retained_blocks', 'retained_bytes'
+])
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+
+def _traced_diff(after, before):
+    diff = after.compare_to(before, 'lineno')
+    return sum(stat.count_diff for stat in diff), sum(stat.size_diff for stat in diff)
+
+
+def measure_allocations(structure, frames, values_list):
+    """
+    Return the AllocationStats of one parse/build pass, or None without tracemalloc.
+
+    tracemalloc can not count the temporary allocations, so the memory is reported as:
+
+    - peak_bytes: the peak of traced memory above the start of the pass, None if the peak can not be reset
+      (python < 3.9 and tracemalloc was already started).
+    - result_blocks/result_bytes: the memory blocks held by the parsed values and the built frames.
+    - retained_blocks/retained_bytes: the memory blocks still held after the results are released (caches, leaks).
+    """
+    if tracemalloc is None:
+        return None
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+            can_peak = True
+        else:
+            can_peak = not was_tracing
+        before = _snapshot()
+        current_before, _ = tracemalloc.get_traced_memory()
+        results = (_parse_all(structure, frames), [structure.build(**values) for values in values_list])
+        _, peak = tracemalloc.get_traced_memory()
+        during = _snapshot()
+        del results
+        after = _snapshot()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    result_blocks, result_bytes = _traced_diff(during, before)
+    retained_blocks, retained_bytes = _traced_diff(after, before)
+    return AllocationStats(
+        peak_bytes=peak - current_before if can_peak else None,
+        result_blocks=result_blocks,
+        result_bytes=result_bytes,
+        retained_blocks=retained_blocks,
+        retained_bytes=retained_bytes
+    )
+
+
+def profile_hotspots(structure, frames, values_list, limit=15, sort='tottime'):
+    """Return the cProfile report of one parse/build pass as text."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    _parse_all(structure, frames)
+    _build_all(structure, values_list)
+    profiler.disable()
+    stream = io.StringIO() if sys.version_info[0] >= 3 else io.BytesIO()
+    pstats.Stats(profiler, stream=stream).sort_stats(sort).print_stats(limit)
+    report = stream.getvalue()
+    return report.decode('utf8') if isinstance(report, bytes) else report
+
+
+# ---------- Report ----------
+
+def report(structure, frames, repeat=3, limit=15, out=None):
+    out = out or sys.stdout
+    values_list, errors = _parse_all(structure, frames)
+    total_bytes = sum(len(frame) for frame in frames)
+
+    def write(line=''):
+        out.write(line + '\n')
+
+    write('Structure: {}.{}'.format(type(structure).__module__, type(structure).__name__))
+    write('Frames: {} ({} bytes, {} parse errors)'.format(len(frames), total_bytes, errors))
+
+    write()
+    write('== Throughput (best of {}) =='.format(repeat))
+    parse_seconds, build_seconds = measure_throughput(structure, frames, values_list, repeat=repeat)
+    for name, count, seconds in (('parse', len(frames), parse_seconds), ('build', len(values_list), build_seconds)):
+        rate = count / seconds if seconds else float('inf')
+        byte_rate = total_bytes / seconds / 1e6 if seconds else float('inf')
+        write('{:<6} {:>10.6f} s {:>14.1f} frames/s {:>10.3f} MB/s'.format(name, seconds, rate, byte_rate))
+
+    write()
+    write('== Per-field time ==')
+    write('{:<24} {:>8} {:>12} {:>12}'.format('field', 'count', 'parse (s)', 'build (s)'))
+    stats = field_breakdown(structure, frames, values_list)
+    for name, (count, parse_time, build_time) in sorted(stats.items(), key=lambda x: -(x[1][1] + x[1][2])):
+        write('{:<24} {:>8} {:>12.6f} {:>12.6f}'.format(name, count, parse_time, build_time))
+
+    write()
+    write('== Memory (one parse/build pass, tracemalloc) ==')
+    stats = measure_allocations(structure, frames, values_list)
+    if stats is None:
+        write('tracemalloc is not available')
+    else:
+        peak = 'n/a' if stats.peak_bytes is None else stats.peak_bytes
+        write('peak bytes during the pass:      {}'.format(peak))
+        write('held by the results:             {} blocks, {} bytes'.format(stats.result_blocks, stats.result_bytes))
+        write('retained after the results:      {} blocks, {} bytes'.format(
+            stats.retained_blocks, stats.retained_bytes))
+
+    write()
+    write('== cProfile hotspots ==')
+    write(profile_hotspots(structure, frames, values_list, limit=limit).strip())
+
+
+def main(argv=None, out=None):
+    parser = argparse.ArgumentParser(prog='python -m conf_struct.profile', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('structure', help="ConfStructure subclass, 'package.module:Class' or 'package.module.Class'")
+    parser.add_argument('capture', help='The capture file of frames')
+    parser.add_argument('--format', choices=['hex', 'binary'], default='hex', help='Capture file format')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeat count for the throughput timing')
+    parser.add_argument('--limit', type=int, default=15, help='Number of cProfile hotspots to show')
+    args = parser.parse_args(argv)
+
+    structure = load_structure(args.structure)
+    frames = read_frames(args.capture, format=args.format)
+    report(structure, frames, repeat=args.repeat, limit=args.limit, out=out)
+
+
+if __name__ == '__main__':
+    main()
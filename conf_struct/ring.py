@@ -0,0 +1,173 @@
+# coding=utf8
+"""
+A frame ring buffer in shared memory, a producer process appends raw frames and a consumer process parses them
+directly from the shared memory, the payloads are never copied or pickled.
+
+A ring has one producer and one consumer. For several workers, create one ring per worker and dispatch the frames
+between the rings in the producer.
+
+NOTE: multiprocessing.shared_memory requires python 3.8+.
+"""
+from __future__ import unicode_literals
+
+import multiprocessing
+import struct
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+# capacity, write position, read position. Positions only increase, the offset is position % capacity.
+_CONTROL = struct.Struct('<QQQ')
+_POSITIONS = struct.Struct('<QQ')
+_POSITION = struct.Struct('<Q')
+_WRITE_OFFSET = 8
+_READ_OFFSET = 16
+_LENGTH = struct.Struct('<I')
+_WRAP = 0xFFFFFFFF
+
+
+class FrameRingBuffer(object):
+    """
+    Length-prefixed frame slots in a multiprocessing.shared_memory block.
+
+    Create the ring with a capacity in the parent process and pass it to the worker process (the lock is inherited),
+    or attach to an existing ring by name and lock. The payloads are written and read without the lock, the lock
+    only guards the positions so that a slot is published after its payload.
+    """
+
+    def __init__(self, capacity=1 << 20, name=None, lock=None):
+        if shared_memory is None:
+            raise RuntimeError('FrameRingBuffer requires multiprocessing.shared_memory (python 3.8+)')
+        if name is None:
+            if capacity <= _LENGTH.size:
+                raise ValueError('Capacity {} is too small'.format(capacity))
+            self._shm = shared_memory.SharedMemory(create=True, size=_CONTROL.size + capacity)
+            _CONTROL.pack_into(self._shm.buf, 0, capacity, 0, 0)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            capacity, _, _ = _CONTROL.unpack_from(self._shm.buf, 0)
+        self.capacity = capacity
+        self._lock = lock or multiprocessing.Lock()
+        self._data = self._shm.buf[_CONTROL.size:_CONTROL.size + capacity]
+
+    def __reduce__(self):
+        return type(self), (0, self.name, self._lock)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def _positions(self):
+        with self._lock:
+            return _POSITIONS.unpack_from(self._shm.buf, _WRITE_OFFSET)
+
+    def _publish(self, offset, position):
+        with self._lock:
+            _POSITION.pack_into(self._shm.buf, offset, position)
+
+    @property
+    def pending_bytes(self):
+        """The number of bytes used by the pending frames."""
+        write, read = self._positions()
+        return write - read
+
+    # ---------- Producer API ----------
+
+    def put(self, frame):
+        """Append a frame, return False if the ring is full."""
+        return self.put_many([frame]) == 1
+
+    def put_many(self, frames):
+        """Append frames until the ring is full, return the number of appended frames."""
+        capacity = self.capacity
+        data = self._data
+        write, read = self._positions()
+        count = 0
+        for frame in frames:
+            length = len(frame)
+            if length + _LENGTH.size > capacity or length >= _WRAP:
+                raise ValueError('Frame of {} bytes is too large for the ring'.format(length))
+            offset = write % capacity
+            skip = capacity - offset if capacity - offset < _LENGTH.size + length else 0
+            if write + skip + _LENGTH.size + length - read > capacity:
+                break
+            if skip:
+                if skip >= _LENGTH.size:
+                    _LENGTH.pack_into(data, offset, _WRAP)
+                write += skip
+                offset = 0
+            _LENGTH.pack_into(data, offset, length)
+            data[offset + _LENGTH.size:offset + _LENGTH.size + length] = frame
+            write += _LENGTH.size + length
+            count += 1
+        if count:
+            self._publish(_WRITE_OFFSET, write)
+        return count
+
+    # ---------- Consumer API ----------
+
+    def iter_frames(self, max_frames=None):
+        """
+        Yield a memoryview of every pending frame, the view is only valid until the next frame is requested.
+
+        The slots are released when the generator is exhausted or closed.
+        """
+        capacity = self.capacity
+        data = self._data
+        write, read = self._positions()
+        count = 0
+        try:
+            while read < write and (max_frames is None or count < max_frames):
+                offset = read % capacity
+                if capacity - offset < _LENGTH.size:
+                    read += capacity - offset
+                    continue
+                length, = _LENGTH.unpack_from(data, offset)
+                if length == _WRAP:
+                    read += capacity - offset
+                    continue
+                start = offset + _LENGTH.size
+                view = data[start:start + length]
+                read += _LENGTH.size + length
+                count += 1
+                try:
+                    yield view
+                finally:
+                    view.release()
+        finally:
+            self._publish(_READ_OFFSET, read)
+
+    def consume(self, structure, max_frames=None):
+        """
+        Yield the parsed values of pending frames, frames are parsed from the shared memory by structure.
+
+        A frame raising an exception is released and the exception is propagated. Values must not keep a reference
+        to the binary (e.g. returned by a parse_xxx hook), copy it with bytes() if needed.
+        """
+        parse = structure.parse
+        frames = self.iter_frames(max_frames=max_frames)
+        try:
+            for view in frames:
+                yield parse(view)
+        finally:
+            frames.close()
+
+    # ---------- Resource ----------
+
+    def close(self):
+        if self._data is not None:
+            self._data.release()
+            self._data = None
+            self._shm.close()
+
+    def unlink(self):
+        """Destroy the shared memory block, it should be called once by the creator."""
+        self._shm.unlink()
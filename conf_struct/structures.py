@@ -2,13 +2,23 @@
 
 from __future__ import unicode_literals
 
+import functools
+import operator
+import re
 import struct
+import sys
 
 import six
 
-from .fields import CFieldBase
+from .constructors import CSingle, CSequence
+from .fields import CFieldBase, SingleField, SequenceField
 from .exceptions import *
 
+try:
+    from . import _speedups
+except ImportError:
+    _speedups = None
+
 
 class COptions(object):
     code_format = '>B'
@@ -42,25 +52,123 @@ class COptions(object):
         return length
 
 
+# ---------- Accelerator ----------
+
+_UINT_FORMAT_RE = re.compile(r'^[@=<>!]?[BHILQ]$')
+_NATIVE_BIG_ENDIAN = sys.byteorder == 'big'
+
+
+def _header_layout(opts):
+    """Return (code_size, length_size, big_endian) if the C accelerator can handle the headers of opts."""
+    for name in ('size', 'code_offset', 'length_offset', 'pack', 'unpack_code', 'unpack_length'):
+        if getattr(type(opts), name) != getattr(COptions, name):
+            return None
+    orders = set()
+    for fmt in (opts.code_format, opts.length_format):
+        fmt_str = fmt.format.decode('ascii') if isinstance(fmt.format, bytes) else fmt.format
+        if not _UINT_FORMAT_RE.match(fmt_str):
+            return None
+        if fmt.size > 1:
+            if fmt_str[0] in '>!':
+                orders.add(True)
+            elif fmt_str[0] == '<':
+                orders.add(False)
+            else:
+                orders.add(_NATIVE_BIG_ENDIAN)
+    if len(orders) > 1:
+        return None
+    return opts.code_format.size, opts.length_format.size, orders.pop() if orders else True
+
+
+def _is_plain_field(field):
+    """Return True if the value is exactly the result of struct.unpack, i.e. no hook and no bytes to decode."""
+    if type(field) not in (SingleField, SequenceField) or type(field.constructor) not in (CSingle, CSequence):
+        return False
+    st = field.constructor.struct
+    fmt = st.format.decode('ascii') if isinstance(st.format, bytes) else st.format
+    if 's' in fmt or 'p' in fmt or 'c' in fmt:
+        return False
+    return type(field.constructor) is CSequence or len(st.unpack(b'\x00' * st.size)) == 1
+
+
+def _speedups_lookup(code_lookup):
+    lookup = {}
+    for code, field in six.iteritems(code_lookup):
+        if _is_plain_field(field):
+            lookup[code] = (field.name, field.constructor.struct.unpack, type(field.constructor) is CSingle, field)
+        else:
+            lookup[code] = (field.name, None, False, field)
+    return lookup
+
+
+def _build_plan(fields, opts):
+    """Return (name, build, code, size, header) of fields, header is packed once for fixed-size fields."""
+    plan = []
+    for field in fields:
+        size = getattr(field.constructor, 'byte_size', None)
+        header = None
+        if size:
+            try:
+                header = opts.pack(field.code, size)
+            except (struct.error, TypeError):
+                pass
+        plan.append((field.name, field.build, field.code, size, header))
+    return tuple(plan)
+
+
 # ---------- ConfStruct ----------
 
+def _compile(bases, opts_cls, opts, fields, code_lookup):
+    """
+    Return (build plan, header layout, speedups lookup), shared with a base class with the same options and fields
+    (e.g. firmware variants). The plans are only held by the classes, so dynamic classes can be garbage collected.
+    """
+    for base in bases:
+        if type(getattr(base, '_opts', None)) is opts_cls and getattr(base, 'fields', None) == fields:
+            return base._build_plan, base._header_layout, base._speedups_lookup
+    return (
+        _build_plan(fields, opts),
+        _header_layout(opts) if _speedups else None,
+        _speedups_lookup(code_lookup)
+    )
+
+
 class ConfStructureMeta(type):
     def __new__(cls, name, bases, attrs):
+        opts_cls = attrs.pop('Options', None)
+        for field_name, field in six.iteritems(attrs):
+            if isinstance(field, CFieldBase):
+                field.name = field_name
+        new_cls = type.__new__(cls, name, bases, attrs)
+
+        # Fields declared along the MRO, so that fields agree with the attribute lookup
+        declared = {}
+        for klass in reversed(new_cls.__mro__):
+            for field_name, field in list(six.iteritems(vars(klass))):
+                if isinstance(field, CFieldBase):
+                    declared[field_name] = field
+                elif field is None and field_name in declared:
+                    # Remove the inherited field
+                    del declared[field_name]
+
+        fields = sorted(six.itervalues(declared), key=operator.attrgetter('creation_counter'))
         code_lookup = {}
         name_lookup = {}
-        for name, field in six.iteritems(attrs):
-            if isinstance(field, CFieldBase):
-                if field.code in code_lookup:
-                    raise DefineException('Duplicate code {} for {}'.format(field.code, name))
-                field.name = name
-                code_lookup[field.code] = field
-                name_lookup[name] = field
-        attrs['code_lookup'] = code_lookup
-        attrs['name_lookup'] = name_lookup
-        opts_cls = attrs.pop('Options', COptions)
-        attrs['_opts'] = opts_cls()
+        for field in fields:
+            if field.code in code_lookup:
+                raise DefineException('Duplicate code {} for {}'.format(field.code, field.name))
+            code_lookup[field.code] = field
+            name_lookup[field.name] = field
+        new_cls.fields = tuple(fields)
+        new_cls.code_lookup = code_lookup
+        new_cls.name_lookup = name_lookup
 
-        return type.__new__(cls, name, bases, attrs)
+        if opts_cls is None:
+            opts_cls = type(new_cls._opts) if hasattr(new_cls, '_opts') else COptions
+        new_cls._opts = opts = opts_cls()
+        new_cls._build_plan, new_cls._header_layout, new_cls._speedups_lookup = _compile(
+            bases, opts_cls, opts, new_cls.fields, code_lookup)
+        return new_cls
 
 
 class ConfStructure(six.with_metaclass(ConfStructureMeta)):
@@ -69,7 +177,119 @@ class ConfStructure(six.with_metaclass(ConfStructureMeta)):
         return self._opts
 
     def parse(self, binary):
-        values = {}
+        if self._header_layout:
+            code_size, length_size, big_endian = self._header_layout
+            return _speedups.parse(binary, code_size, length_size, big_endian, self._speedups_lookup,
+                                   self._parse_field, ParseException)
+        return self._parse_python(binary)
+
+    def parse_into(self, binary, target, default=None):
+        """
+        Parse binary into a reusable target without creating a dict, return the target.
+
+        Values are stored by item if target supports it (dict, numpy structured row), otherwise by attribute.
+        Fields absent from binary are reset to default. The target is partially updated if an exception is raised.
+
+        Only the values dict is saved: field values are still created (e.g. a tuple and a dict for DictionaryField),
+        and without the C accelerator a store callable is created per call (target.__setitem__ or a functools.partial).
+        """
+        use_setattr = not hasattr(target, '__setitem__')
+        if use_setattr:
+            for name in self.name_lookup:
+                setattr(target, name, default)
+        else:
+            for name in self.name_lookup:
+                target[name] = default
+        if self._header_layout:
+            code_size, length_size, big_endian = self._header_layout
+            _speedups.parse(binary, code_size, length_size, big_endian, self._speedups_lookup,
+                            self._parse_field, ParseException, target, use_setattr)
+        else:
+            self._parse_python(binary, functools.partial(setattr, target) if use_setattr else target.__setitem__)
+        return target
+
+    def build(self, **kwargs):
+        if self._header_layout:
+            code_size, length_size, big_endian = self._header_layout
+            return _speedups.build(self._build_plan, kwargs, code_size, length_size, big_endian,
+                                   self._build_hook, struct.error)
+        return self._build_python(kwargs)
+
+    def diff(self, old_binary, new_binary):
+        """
+        Return the records of new_binary which are absent or different in old_binary, bodies are not parsed.
+
+        Like parse, only the last record of a repeated code counts.
+        """
+        old_records = {}
+        for code, start, end in self._scan_records(old_binary):
+            old_records[code] = old_binary[start:end]
+        new_records = self._scan_records(new_binary)
+        last_starts = dict((code, start) for code, start, end in new_records)
+        chunks = []
+        for code, start, end in new_records:
+            record = new_binary[start:end]
+            if last_starts[code] == start and old_records.get(code) != record:
+                chunks.append(record)
+        return b''.join(chunks)
+
+    def delta_build(self, old_values, new_values):
+        """Build the values of new_values which are absent or different in old_values."""
+        changed = {}
+        for name, value in six.iteritems(new_values):
+            if name not in old_values or old_values[name] != value:
+                changed[name] = value
+        return self.build(**changed)
+
+    def _scan_records(self, binary):
+        """Return (code, start, end) of every record including its header, with the same checks as parse."""
+        records = []
+        opts = self.opts
+        header_size = opts.size
+        index = 0
+        total = len(binary) - header_size
+        if len(binary) != 0 and total <= 0:
+            raise ParseException('No enough binary')
+        while index <= total:
+            code = opts.unpack_code(binary, offset=index)
+            length = opts.unpack_length(binary, offset=index + opts.length_offset)
+            end = index + header_size + length
+            if end > len(binary):
+                raise ParseException('No enough binary, expect {} but {}'.format(
+                    length, len(binary) - index - header_size))
+            if code not in self.code_lookup:
+                raise ParseException('Invalid code {}'.format(code))
+            records.append((code, index, end))
+            index = end
+        return records
+
+    def _parse_field(self, field, value_binary):
+        value = field.parse(value_binary)
+        if value is None:
+            func = getattr(self, 'parse_{}'.format(field.name), None)
+            if func:
+                value = func(value_binary)
+        return value
+
+    def _build_field(self, field, value):
+        value_binary = field.build(value)
+        if value_binary is None:
+            value_binary = self._build_hook(field.name, value)
+        return value_binary
+
+    def _build_hook(self, name, value):
+        func = getattr(self, 'build_' + name, None)
+        if func:
+            return func(value)
+        return None
+
+    # Pure python parser and builder, used when the C accelerator is unavailable.
+
+    def _parse_python(self, binary, store=None):
+        values = None
+        if store is None:
+            values = {}
+            store = values.__setitem__
         index = 0
         total = len(binary) - self.opts.size
         if len(binary) != 0 and total <= 0:
@@ -81,13 +301,9 @@ class ConfStructure(six.with_metaclass(ConfStructureMeta)):
             if len(value_binary) == length:
                 field = self.code_lookup.get(code)
                 if field:
-                    value = field.parse(value_binary)
-                    if value is None:
-                        func = getattr(self, 'parse_{}'.format(field.name), None)
-                        if func:
-                            value = func(value_binary)
+                    value = self._parse_field(field, value_binary)
                     if value:
-                        values[field.name] = value
+                        store(field.name, value)
                 else:
                     raise ParseException('Invalid code {}'.format(code))
             else:
@@ -95,20 +311,21 @@ class ConfStructure(six.with_metaclass(ConfStructureMeta)):
             index += length + self.opts.size
         return values
 
-    def build(self, **kwargs):
-        binary = b''
-        for name, value in kwargs.items():
-            value_binary = None
-            field = self.name_lookup.get(name)
-            if field:
-                value_binary = field.build(value)
-                if value_binary is None:
-                    func = getattr(self, 'build_' + field.name, None)
-                    if func:
-                        value_binary = func(value)
+    def _build_python(self, values):
+        chunks = []
+        for name, field_build, code, size, header in self._build_plan:
+            if name not in values:
+                continue
+            value = values[name]
+            value_binary = field_build(value)
+            if value_binary is None:
+                value_binary = self._build_hook(name, value)
             if value_binary:
-                binary += self.opts.pack(field.code, len(value_binary)) + value_binary
-        return binary
+                if header is None or len(value_binary) != size:
+                    header = self.opts.pack(code, len(value_binary))
+                chunks.append(header)
+                chunks.append(value_binary)
+        return b''.join(chunks)
 
 
 # Old alias
@@ -2,7 +2,12 @@
 
 from __future__ import unicode_literals
 
-from setuptools import setup
+import platform
+
+from setuptools import setup, Extension
+from setuptools.command.build_ext import build_ext
+# Imported after setuptools, which provides distutils on python 3.12+
+from distutils.errors import CCompilerError, DistutilsExecError, DistutilsPlatformError
 
 lib_classifiers = [
     "Development Status :: 4 - Beta",
@@ -18,6 +23,29 @@ lib_classifiers = [
     "Topic :: Utilities",
 ]
 
+
+class OptionalBuildExt(build_ext):
+    """Build the C accelerator if possible, python 2 distutils does not support Extension(optional=True)."""
+
+    def run(self):
+        try:
+            build_ext.run(self)
+        except DistutilsPlatformError as e:
+            self.warn('The C accelerator is not built: {}'.format(e))
+
+    def build_extension(self, ext):
+        try:
+            build_ext.build_extension(self, ext)
+        except (CCompilerError, DistutilsExecError, DistutilsPlatformError, IOError, ValueError) as e:
+            self.warn('The C accelerator is not built: {}'.format(e))
+
+
+# The C accelerator is optional, ConfStructure falls back to pure python when it is unavailable.
+if platform.python_implementation() == 'CPython':
+    ext_modules = [Extension(str('conf_struct._speedups'), sources=[str('conf_struct/_speedups.c')])]
+else:
+    ext_modules = []
+
 setup(name="ConfStruct",
       version='0.8.0',
       author="kinegratii",
@@ -25,6 +53,8 @@ setup(name="ConfStruct",
       url="https://github.com/kinegratii/ConfStruct",
       keywords="struct binary pack unpack",
       packages=['conf_struct'],
+      ext_modules=ext_modules,
+      cmdclass={'build_ext': OptionalBuildExt},
       install_requires=['six'],
       description='A parser and builder between python dictionary and "length-body" binary data.',
       license="MIT",
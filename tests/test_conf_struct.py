@@ -2,14 +2,13 @@
 
 from __future__ import unicode_literals
 
-import sys
+import gc
 import struct
 import unittest
+import weakref
 
-from conf_struct import ConfStructure, DefineException, COptions, SequenceField, SingleField, DictionaryField, \
-    ConstructorField
-
-PY36 = sys.version_info[:2] >= (3, 6)
+from conf_struct import ConfStructure, DefineException, ParseException, COptions, SequenceField, SingleField, \
+    DictionaryField, ConstructorField
 
 
 class ServerAddressConstructor:
@@ -38,17 +37,19 @@ class ConfDefineTestCase(unittest.TestCase):
 
 
 class ConfTestCase(unittest.TestCase):
+    def test_fields_order(self):
+        self.assertEqual(
+            ['delayed_restart', 'server_address', 'awaken_period'],
+            [field.name for field in DeviceConfStructure.fields]
+        )
+
     def test_base(self):
         dcs = DeviceConfStructure()
 
         binary_data = dcs.build(delayed_restart=180, awaken_period=3600)
-        if PY36:
-            self.assertEqual(b'\x01\x02\x00\xb4\x03\x04\x00\x00\x0e\x10', binary_data)
-        else:
-            self.assertIn(binary_data, {
-                b'\x01\x02\x00\xb4\x03\x04\x00\x00\x0e\x10',
-                b'\x03\x04\x00\x00\x0e\x10\x01\x02\x00\xb4'
-            })
+        self.assertEqual(b'\x01\x02\x00\xb4\x03\x04\x00\x00\x0e\x10', binary_data)
+        # Records are built in the declaration order of fields
+        self.assertEqual(binary_data, dcs.build(awaken_period=3600, delayed_restart=180))
 
         test_binary = b'\x01\x02\x00\xB4\x03\x04\x00\x00\x0e\x10'
         data = dcs.parse(test_binary)
@@ -84,10 +85,7 @@ class ConfTestCase(unittest.TestCase):
             b'\x03\x04\x00\x00\x0e\x10\x01\x02\x00\xb4\x02\x06\xc0\xa8\x01\xc8\x27\xd8',
             b'\x03\x04\x00\x00\x0e\x10\x02\x06\xc0\xa8\x01\xc8\x27\xd8\x01\x02\x00\xb4'
         }
-        if PY36:
-            self.assertEqual(b'\x01\x02\x00\xb4\x03\x04\x00\x00\x0e\x10\x02\x06\xc0\xa8\x01\xc8\x27\xd8', binary_data)
-        else:
-            self.assertIn(binary_data, result)
+        self.assertEqual(b'\x01\x02\x00\xb4\x02\x06\xc0\xa8\x01\xc8\x27\xd8\x03\x04\x00\x00\x0e\x10', binary_data)
 
         for test_binary in result:
             data = dcs.parse(test_binary)
@@ -138,5 +136,162 @@ class BTestCase(unittest.TestCase):
         self.assertEqual({'c5': {'x': 2, 'y': 4}}, acs.parse(b'\x05\x02\02\x04'))
 
 
+# --------------- Delta features------------------------------------
+
+class DeltaTestCase(unittest.TestCase):
+    def test_diff(self):
+        dcs = DeviceConfStructure()
+        old = dcs.build(delayed_restart=180, server_address='192.168.1.200:10200', awaken_period=3600)
+        new = dcs.build(delayed_restart=180, server_address='192.168.1.201:10200', awaken_period=60)
+        self.assertEqual(b'\x02\x06\xc0\xa8\x01\xc9\x27\xd8\x03\x04\x00\x00\x00\x3c', dcs.diff(old, new))
+        self.assertEqual(b'', dcs.diff(old, old))
+        self.assertEqual(new, dcs.diff(b'', new))
+        # Only the last record of a repeated code counts, like parse
+        self.assertEqual(b'', dcs.diff(b'\x01\x02\x00\xb4', b'\x01\x02\x00\x05\x01\x02\x00\xb4'))
+        self.assertEqual(b'\x01\x02\x00\x05', dcs.diff(b'\x01\x02\x00\x05\x01\x02\x00\xb4',
+                                                    b'\x01\x02\x00\xb4\x01\x02\x00\x05'))
+        # Added record
+        self.assertEqual(b'\x01\x02\x00\xb4', dcs.diff(b'\x03\x04\x00\x00\x0e\x10', old[:4] + old[-6:]))
+        with self.assertRaises(ParseException):
+            dcs.diff(old[:-1], new)
+        with self.assertRaises(ParseException):
+            dcs.diff(old, b'\x09\x00')
+
+    def test_delta_build(self):
+        dcs = DeviceConfStructure()
+        old_values = {'delayed_restart': 180, 'server_address': '192.168.1.200:10200'}
+        new_values = {'delayed_restart': 180, 'server_address': '192.168.1.201:10200', 'awaken_period': 60}
+        self.assertEqual(
+            b'\x02\x06\xc0\xa8\x01\xc9\x27\xd8\x03\x04\x00\x00\x00\x3c',
+            dcs.delta_build(old_values, new_values)
+        )
+        self.assertEqual(
+            dcs.diff(dcs.build(**old_values), dcs.build(**new_values)),
+            dcs.delta_build(old_values, new_values)
+        )
+        self.assertEqual(b'', dcs.delta_build(new_values, new_values))
+
+
+# --------------- Inherit features------------------------------------
+
+class BaseDeviceStructure(ConfStructure):
+    delayed_restart = SingleField(code=0x01, format='>H')
+    awaken_period = SingleField(code=0x03, format='>I')
+
+
+class DeviceV2Structure(BaseDeviceStructure):
+    server_address = ConstructorField(code=0x02, constructor=ServerAddressConstructor())
+    awaken_period = SingleField(code=0x04, format='>H')
+
+
+class DeviceV3Structure(DeviceV2Structure):
+    delayed_restart = None
+
+
+class WideBaseStructure(ConfStructure):
+    a1 = SingleField(code=0x00, format='>H')
+
+    class Options(COptions):
+        code_format = '>H'
+        length_format = '>H'
+
+
+class WideVariantA(WideBaseStructure):
+    pass
+
+
+class WideVariantB(WideBaseStructure):
+    pass
+
+
+class InheritTestCase(unittest.TestCase):
+    def test_fields(self):
+        self.assertEqual(['delayed_restart', 'awaken_period'], [f.name for f in BaseDeviceStructure.fields])
+        self.assertEqual(['delayed_restart', 'server_address', 'awaken_period'],
+                         [f.name for f in DeviceV2Structure.fields])
+        self.assertEqual([0x01, 0x02, 0x04], sorted(DeviceV2Structure.code_lookup))
+        self.assertEqual(['server_address', 'awaken_period'], [f.name for f in DeviceV3Structure.fields])
+
+    def test_parse_build(self):
+        ds = DeviceV2Structure()
+        binary = ds.build(delayed_restart=180, server_address='192.168.1.200:10200', awaken_period=60)
+        self.assertEqual(b'\x01\x02\x00\xb4\x02\x06\xc0\xa8\x01\xc8\x27\xd8\x04\x02\x00\x3c', binary)
+        self.assertDictEqual(
+            {'delayed_restart': 180, 'server_address': '192.168.1.200:10200', 'awaken_period': 60},
+            ds.parse(binary)
+        )
+        self.assertEqual(b'', DeviceV3Structure().build(delayed_restart=180))
+
+    def test_options(self):
+        self.assertEqual(b'\x00\x00\x00\x02\x00\x01', WideVariantA().build(a1=1))
+
+    def test_shared_plan(self):
+        self.assertIs(WideVariantA._build_plan, WideVariantB._build_plan)
+        self.assertIs(WideVariantA._speedups_lookup, WideVariantB._speedups_lookup)
+        self.assertIsNot(DeviceV2Structure._build_plan, DeviceV3Structure._build_plan)
+
+    def test_dynamic_class_collected(self):
+        options = type(str('Options'), (COptions,), {'code_format': '>H'})
+        field = SingleField(code=0x01, format='>B')
+        variant = type(ConfStructure)(str('DynamicVariant'), (WideBaseStructure,), {'a2': field, 'Options': options})
+        self.assertEqual(b'\x00\x01\x01\x05', variant().build(a2=5))
+        refs = list(map(weakref.ref, (variant, options, field)))
+        del variant, options, field
+        gc.collect()
+        self.assertEqual([None, None, None], [ref() for ref in refs])
+
+    def test_multiple_inheritance(self):
+        class RebootStructure(BaseDeviceStructure):
+            reboot = SingleField(code=0x05, format='>B')
+
+        class NoRestartStructure(BaseDeviceStructure):
+            delayed_restart = None
+
+        for variant in (type(str('A'), (RebootStructure, NoRestartStructure), {}),
+                        type(str('B'), (NoRestartStructure, RebootStructure), {})):
+            self.assertIsNone(variant.delayed_restart)
+            self.assertEqual(['awaken_period', 'reboot'], [f.name for f in variant.fields])
+            self.assertEqual(b'\x05\x01\x01', variant().build(delayed_restart=180, reboot=1))
+
+    def test_duplicate_code(self):
+        with self.assertRaises(DefineException):
+            class DuplicateCodeStructure(BaseDeviceStructure):
+                reboot = SingleField(code=0x01, format='>B')
+
+
+# --------------- Reusable target features------------------------------------
+
+class DeviceRecord(object):
+    __slots__ = ('delayed_restart', 'server_address', 'awaken_period')
+
+
+class ParseIntoTestCase(unittest.TestCase):
+    def test_dict(self):
+        dcs = DeviceConfStructure()
+        target = {}
+        self.assertIs(target, dcs.parse_into(b'\x01\x02\x00\xb4\x03\x04\x00\x00\x0e\x10', target))
+        self.assertDictEqual({'delayed_restart': 180, 'server_address': None, 'awaken_period': 3600}, target)
+        dcs.parse_into(b'\x02\x06\xc0\xa8\x01\xc8\x27\xd8\x01\x02\x00\x00', target, default=0)
+        self.assertDictEqual({'delayed_restart': 0, 'server_address': '192.168.1.200:10200', 'awaken_period': 0},
+                             target)
+
+    def test_slots(self):
+        dcs = DeviceConfStructure()
+        record = DeviceRecord()
+        dcs.parse_into(b'\x03\x04\x00\x00\x0e\x10', record)
+        self.assertEqual((None, None, 3600), (record.delayed_restart, record.server_address, record.awaken_period))
+        dcs.parse_into(b'\x01\x02\x00\xb4', record)
+        self.assertEqual((180, None, None), (record.delayed_restart, record.server_address, record.awaken_period))
+        with self.assertRaises(ParseException):
+            dcs.parse_into(b'\x01\x02\x00', record)
+
+    def test_python_store(self):
+        dcs = DeviceConfStructure()
+        target = {}
+        # No values dict is created when a store is given
+        self.assertIsNone(dcs._parse_python(b'\x01\x02\x00\xb4', target.__setitem__))
+        self.assertEqual({'delayed_restart': 180}, target)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -27,6 +27,8 @@ class ConstructorTestCase(unittest.TestCase):
         dc = CDictionary(format='>HH', field_names='x y')
         self.assertEqual(b'\x00\x01\x00\x01', dc.build({'x': 1, 'y': 1}))
         self.assertDictEqual({'x': 1, 'y': 2}, dc.parse(b'\x00\x01\x00\x02'))
+        # Keys keep the order of field_names
+        self.assertEqual(['z', 'a'], list(CDictionary(format='>BB', field_names='z a').parse(b'\x01\x02')))
 
     def test_CString(self):
         cs = CString(byte_length=5)
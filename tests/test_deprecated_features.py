@@ -5,13 +5,10 @@ Test Case for CField, this module will be removed in v1.0.0 .
 from __future__ import unicode_literals
 
 import struct
-import sys
 import unittest
 
 from conf_struct import ConfStruct, CField, DefineException, COptions
 
-PY36 = sys.version_info[:2] >= (3, 6)
-
 
 class ServerAddressStruct:
     def parse(self, binary):
@@ -43,13 +40,9 @@ class ConfTestCase(unittest.TestCase):
         dcs = DeviceConfStruct()
 
         binary_data = dcs.build(delayed_restart=180, awaken_period=3600)
-        if PY36:
-            self.assertEqual(b'\x01\x02\x00\xb4\x03\x04\x00\x00\x0e\x10', binary_data)
-        else:
-            self.assertIn(binary_data, {
-                b'\x01\x02\x00\xb4\x03\x04\x00\x00\x0e\x10',
-                b'\x03\x04\x00\x00\x0e\x10\x01\x02\x00\xb4'
-            })
+        self.assertEqual(b'\x01\x02\x00\xb4\x03\x04\x00\x00\x0e\x10', binary_data)
+        # Records are built in the declaration order of fields
+        self.assertEqual(binary_data, dcs.build(awaken_period=3600, delayed_restart=180))
 
         test_binary = b'\x01\x02\x00\xB4\x03\x04\x00\x00\x0e\x10'
         data = dcs.parse(test_binary)
@@ -85,10 +78,7 @@ class ConfTestCase(unittest.TestCase):
             b'\x03\x04\x00\x00\x0e\x10\x01\x02\x00\xb4\x02\x06\xc0\xa8\x01\xc8\x27\xd8',
             b'\x03\x04\x00\x00\x0e\x10\x02\x06\xc0\xa8\x01\xc8\x27\xd8\x01\x02\x00\xb4'
         }
-        if PY36:
-            self.assertEqual(b'\x01\x02\x00\xb4\x03\x04\x00\x00\x0e\x10\x02\x06\xc0\xa8\x01\xc8\x27\xd8', binary_data)
-        else:
-            self.assertIn(binary_data, result)
+        self.assertEqual(b'\x01\x02\x00\xb4\x02\x06\xc0\xa8\x01\xc8\x27\xd8\x03\x04\x00\x00\x0e\x10', binary_data)
 
         for test_binary in result:
             data = dcs.parse(test_binary)
@@ -2,9 +2,12 @@
 
 from __future__ import unicode_literals
 
+import datetime
+import struct
 import unittest
 
-from conf_struct.exts import CIPv4, CIPv4Port
+from conf_struct import BuildException, ParseException
+from conf_struct.exts import CIPv4, CIPv4Port, CIPv6, CMac, CBCDTimestamp
 
 
 class ExtTestCase(unittest.TestCase):
@@ -16,3 +19,77 @@ class ExtTestCase(unittest.TestCase):
         cip = CIPv4Port()
         self.assertEqual(b'\xc0\xa8\x01\xc8\x27\xd8', cip.build('192.168.1.200:10200'))
         self.assertEqual('192.168.1.200:10200', cip.parse(b'\xc0\xa8\x01\xc8\x27\xd8'))
+
+    def test_fallback(self):
+        ci = CIPv4()
+        self.assertEqual(b'\x0a\x00\x00\x01', ci.build('010.0.0.1'))
+        with self.assertRaises(struct.error):
+            ci.build('1.2.3')
+        with self.assertRaises(struct.error):
+            ci.parse(b'\x01\x02\x03')
+
+        cip = CIPv4Port()
+        with self.assertRaises(struct.error):
+            cip.build('192.168.1.200:70000')
+
+    def test_cache(self):
+        cip = CIPv4Port(cache_size=2)
+        for _ in range(3):
+            self.assertEqual(b'\xc0\xa8\x01\xc8\x27\xd8', cip.build('192.168.1.200:10200'))
+            self.assertEqual('192.168.1.200:10200', cip.parse(memoryview(b'\xc0\xa8\x01\xc8\x27\xd8')))
+        cip.build('1.1.1.1:1')
+        cip.build('1.1.1.2:1')
+        self.assertEqual(1, len(cip._build_cache))
+
+    def test_batch(self):
+        ci = CIPv4()
+        ips = ['192.168.1.200', '10.0.0.1', '255.255.255.255']
+        column = ci.build_many(ips)
+        self.assertEqual(b'\xc0\xa8\x01\xc8\x0a\x00\x00\x01\xff\xff\xff\xff', column)
+        self.assertEqual(ips, ci.parse_many(column))
+        with self.assertRaises(ParseException):
+            ci.parse_many(column[:-1])
+
+        cip = CIPv4Port()
+        addresses = ['192.168.1.200:10200', '10.0.0.1:80']
+        self.assertEqual(addresses, cip.parse_many(cip.build_many(addresses)))
+
+    def test_hooks(self):
+        class MaskedIPv4(CIPv4):
+            def post_parse(self, value):
+                return 'X'
+
+        class OffsetIPv4Port(CIPv4Port):
+            def pre_build(self, value):
+                return [10, 0, 0, 1, int(value)]
+
+        self.assertEqual('X', MaskedIPv4().parse(b'\x01\x02\x03\x04'))
+        self.assertEqual(['X', 'X'], MaskedIPv4().parse_many(b'\x01\x02\x03\x04' * 2))
+        self.assertEqual(b'\x01\x02\x03\x04', MaskedIPv4().build('1.2.3.4'))
+        self.assertEqual(b'\x0a\x00\x00\x01\x00\x50', OffsetIPv4Port().build('80'))
+        self.assertEqual('10.0.0.1:80', OffsetIPv4Port().parse(b'\x0a\x00\x00\x01\x00\x50'))
+
+    def test_ipv6(self):
+        ci6 = CIPv6()
+        binary = b'\x20\x01\x0d\xb8' + b'\x00' * 11 + b'\x01'
+        self.assertEqual(binary, ci6.build('2001:db8::1'))
+        self.assertEqual('2001:db8::1', ci6.parse(binary))
+        with self.assertRaises(BuildException):
+            ci6.build('2001:db8::g')
+
+    def test_mac(self):
+        cm = CMac()
+        self.assertEqual(b'\x00\x1a\x2b\x3c\x4d\xff', cm.build('00:1A:2B:3C:4D:FF'))
+        self.assertEqual(b'\x00\x1a\x2b\x3c\x4d\xff', cm.build('00-1a-2b-3c-4d-ff'))
+        self.assertEqual('00:1a:2b:3c:4d:ff', cm.parse(b'\x00\x1a\x2b\x3c\x4d\xff'))
+        with self.assertRaises(BuildException):
+            cm.build('00:1a:2b')
+
+    def test_bcd_timestamp(self):
+        cbt = CBCDTimestamp()
+        self.assertEqual(b'\x18\x10\x19\x23\x05\x59', cbt.build(datetime.datetime(2018, 10, 19, 23, 5, 59)))
+        self.assertEqual(datetime.datetime(2018, 10, 19, 23, 5, 59), cbt.parse(b'\x18\x10\x19\x23\x05\x59'))
+        with self.assertRaises(ParseException):
+            cbt.parse(b'\x18\x1a\x19\x23\x05\x59')
+        with self.assertRaises(BuildException):
+            cbt.build(datetime.datetime(1999, 1, 1))
@@ -0,0 +1,239 @@
+# coding=utf8
+"""
+Differential fuzzing for ConfStructure.
+
+Random schemas and frames are fed to every parser in PARSERS and the outcomes (value or exception) must be
+identical to the pure python reference. The cost of parsing is also tracked per input byte, so pathological
+frames (e.g. a lot of zero-length records) are reported as performance bugs.
+"""
+from __future__ import unicode_literals
+
+import binascii
+import os
+import random
+import sys
+import timeit
+import unittest
+
+import six
+
+from conf_struct import ConfStructure, COptions, SingleField, SequenceField, DictionaryField, ConstructorField
+from conf_struct.exts import CIPv4, CIPv4Port
+
+SEED = 20181019
+
+# (name, parse function), the first one is the reference.
+PARSERS = [
+    ('python', lambda structure, binary: structure._parse_python(binary)),
+    ('default', lambda structure, binary: structure.parse(binary)),
+    ('parse_into', lambda structure, binary: _parse_into(structure, binary)),
+]
+# bytes() and the str-based hooks do not accept a memoryview on python 2
+if six.PY3:
+    PARSERS.append(('memoryview', lambda structure, binary: structure.parse(memoryview(binary))))
+
+_ABSENT = object()
+
+
+def _parse_into(structure, binary):
+    target = dict.fromkeys(['stale'] + list(structure.name_lookup), 'stale')
+    structure.parse_into(binary, target, default=_ABSENT)
+    del target['stale']
+    return dict((name, value) for name, value in target.items() if value is not _ABSENT)
+
+
+# (code_format, length_format, override offsets), covering every header the accelerator accepts and some it rejects.
+OPTIONS = [
+    ('>B', '>B', False), ('>H', '>H', False), ('<H', '<B', False), ('>B', '>I', False), ('!H', '!B', False),
+    ('<Q', '<I', False), ('H', 'H', False), ('=H', 'I', False), ('@B', 'L', False), ('B', '=Q', False),
+    ('<H', '>H', False), ('>b', '>B', False), ('>B', '>B', True), ('H', 'B', True),
+]
+
+SINGLE_FORMATS = ['>B', '>H', '<i', '>q', '>4s', 'c', '?', '>f', '<d', 'H', '=I', '!h', '@L', 'b']
+SEQUENCE_FORMATS = ['>BH', '<2I', '>B3s', '>cB', '<?f', 'HB', '=hI', '!Qb', '2c']
+# Half floats need python 3.6+
+if sys.version_info >= (3, 6):
+    SINGLE_FORMATS.append('<e')
+    SEQUENCE_FORMATS.append('2e')
+
+FIELD_FACTORIES = [
+    lambda rnd, code: SingleField(code=code, format=rnd.choice(SINGLE_FORMATS)),
+    lambda rnd, code: SequenceField(code=code, format=rnd.choice(SEQUENCE_FORMATS)),
+    lambda rnd, code: DictionaryField(code=code, format='>BB', field_names=['x', 'y']),
+    lambda rnd, code: ConstructorField(code=code, constructor=rnd.choice([CIPv4(), CIPv4Port()])),
+    lambda rnd, code: ConstructorField(code=code),
+]
+
+
+class OffsetOptions(COptions):
+    """Overrides the offsets with the same values, which disables the accelerator."""
+
+    @property
+    def code_offset(self):
+        return 0
+
+    @property
+    def length_offset(self):
+        return self.code_format.size
+
+
+class RawField(object):
+    """Parse/build hooks for ConstructorField without constructor."""
+
+    def __getattr__(self, name):
+        if name.startswith('parse_') or name.startswith('build_'):
+            return bytes
+        raise AttributeError(name)
+
+
+def random_structure(rnd):
+    code_format, length_format, override_offsets = rnd.choice(OPTIONS)
+    max_code = 127 if code_format == '>b' else 255
+    options_base = OffsetOptions if override_offsets else COptions
+    attrs = {
+        'Options': type(str('Options'), (options_base,), {'code_format': code_format, 'length_format': length_format})
+    }
+    for i, code in enumerate(rnd.sample(range(max_code + 1), rnd.randint(1, 8))):
+        attrs['f{}'.format(i)] = rnd.choice(FIELD_FACTORIES)(rnd, code)
+    return type(ConfStructure)(str('RandomStructure'), (RawField, ConfStructure), attrs)()
+
+
+def random_frame(rnd, structure):
+    opts = structure.opts
+    codes = list(structure.code_lookup)
+    chunks = []
+    for _ in range(rnd.randint(0, 8)):
+        code = rnd.choice(codes) if rnd.random() < 0.9 else rnd.randint(0, 127)
+        if rnd.random() < 0.7:
+            constructor = structure.code_lookup[code].constructor if code in structure.code_lookup else None
+            size = getattr(constructor, 'byte_size', rnd.randint(0, 8))
+        else:
+            size = rnd.randint(0, 8)
+        body = bytes(bytearray(rnd.choice([0, 0, 1, 0x7f, 0xff, rnd.randint(0, 255)]) for _ in range(size)))
+        chunks.append(opts.pack(code, len(body)) + body)
+    frame = b''.join(chunks)
+    if frame and rnd.random() < 0.1:
+        frame = frame[:rnd.randint(0, len(frame))]
+    return frame
+
+
+def outcome(func, *args):
+    """Return the value or the exception, as a repr so that NaN values compare equal."""
+    try:
+        return 'ok', _normalize(func(*args))
+    except Exception as e:
+        return 'error', type(e), str(e)
+
+
+def _normalize(value):
+    if isinstance(value, dict):
+        return repr(sorted((k, _normalize(v)) for k, v in value.items()))
+    if isinstance(value, memoryview):
+        return repr(value.tobytes())
+    return repr(value)
+
+
+def calls_per_byte(parser, structure, binary):
+    """The number of python and builtin function calls per byte to parse binary, it does not depend on timing."""
+    counter = [0]
+
+    def profile(frame, event, arg):
+        if event in ('call', 'c_call'):
+            counter[0] += 1
+
+    sys.setprofile(profile)
+    try:
+        outcome(parser, structure, binary)
+    finally:
+        sys.setprofile(None)
+    return float(counter[0]) / max(len(binary), 1)
+
+
+def cost_per_byte(parser, structure, binary, number=3, repeat=3):
+    """Best-of-repeat parse time of binary in seconds per byte."""
+    timer = timeit.Timer(lambda: outcome(parser, structure, binary))
+    return min(timer.repeat(repeat=repeat, number=number)) / number / max(len(binary), 1)
+
+
+def _describe(structure, frame):
+    fields = ', '.join(
+        '{}={}'.format(f.code, getattr(f.constructor, 'struct', f.constructor)) for f in structure.fields)
+    return 'options=({}, {}) fields=[{}] frame={}...'.format(
+        structure.opts.code_format.format, structure.opts.length_format.format, fields,
+        binascii.hexlify(frame[:64]).decode('ascii'))
+
+
+class ZeroLengthStructure(ConfStructure):
+    raw = ConstructorField(code=0x01)
+    value = SingleField(code=0x02, format='>H')
+
+    def parse_raw(self, binary):
+        return binary
+
+
+class DifferentialFuzzTestCase(unittest.TestCase):
+    def test_parsers(self):
+        rnd = random.Random(SEED)
+        for _ in range(200):
+            structure = random_structure(rnd)
+            for _ in range(30):
+                frame = random_frame(rnd, structure)
+                expected = outcome(PARSERS[0][1], structure, frame)
+                for name, parser in PARSERS[1:]:
+                    self.assertEqual(expected, outcome(parser, structure, frame), (name, frame))
+
+    def test_edge_cases(self):
+        zls = ZeroLengthStructure()
+        for frame in [b'', b'\x01', b'\x01\x00', b'\x01\x00\x02', b'\x02\x02\x00\x00', b'\x02\x02\x00\x00\x01',
+                      b'\x03\x00\x01\x00', b'\x01\x05ab']:
+            expected = outcome(PARSERS[0][1], zls, frame)
+            for name, parser in PARSERS[1:]:
+                self.assertEqual(expected, outcome(parser, zls, frame), (name, frame))
+        # Falsy values are dropped
+        self.assertEqual({}, zls.parse(b'\x02\x02\x00\x00\x01\x00'))
+
+
+class WorstCaseCostTestCase(unittest.TestCase):
+    """
+    The cost per byte must not grow with the frame size.
+
+    Function calls are counted by default, wall-clock timing is only checked when CONF_STRUCT_TIMING_TESTS=1 since
+    it is not reliable on busy machines.
+    """
+    MAX_CALLS_GROWTH = 1.5
+    MAX_SLOWDOWN = 4.0
+
+    def _assert_linear(self, cost, max_growth):
+        rnd = random.Random(SEED)
+        zls = ZeroLengthStructure()
+        cases = [(zls, b'\x01\x00' * 2000 + b'\x02\x02\x00\x01', b'\x01\x00' * 20000 + b'\x02\x02\x00\x01')]
+        while len(cases) < 21:
+            structure = random_structure(rnd)
+            frame = random_frame(rnd, structure) * 50
+            if frame and outcome(structure.parse, frame * 10)[0] == 'ok':
+                cases.append((structure, frame, frame * 10))
+        worst = (0, None, None, None)
+        for structure, small, large in cases:
+            for name, parser in PARSERS:
+                growth = cost(parser, structure, large) / max(cost(parser, structure, small), 1e-12)
+                if growth > worst[0]:
+                    worst = (growth, name, structure, large)
+        growth, name, structure, frame = worst
+        self.assertLess(growth, max_growth, 'Worst growth {:.2f} by {} parser for {}'.format(
+            growth, name, _describe(structure, frame)))
+
+    def test_zero_length_records(self):
+        zls = ZeroLengthStructure()
+        large = b'\x01\x00' * 20000 + b'\x02\x02\x00\x01'
+        for name, parser in PARSERS:
+            self.assertEqual({'value': 1}, parser(zls, large), name)
+
+    def test_calls_per_byte(self):
+        self._assert_linear(calls_per_byte, self.MAX_CALLS_GROWTH)
+
+    @unittest.skipUnless(os.environ.get('CONF_STRUCT_TIMING_TESTS') == '1', 'Set CONF_STRUCT_TIMING_TESTS=1 to run')
+    def test_time_per_byte(self):
+        self._assert_linear(cost_per_byte, self.MAX_SLOWDOWN)
+
+if __name__ == '__main__':
+    unittest.main()
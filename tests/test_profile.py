@@ -0,0 +1,81 @@
+# coding=utf8
+
+from __future__ import unicode_literals
+
+import io
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from conf_struct import ParseException
+from conf_struct.profile import load_structure, read_frames, report, main, measure_allocations, tracemalloc
+
+from tests.test_conf_struct import DeviceConfStructure
+
+FRAMES = [b'\x01\x02\x00\xb4', b'\x03\x04\x00\x00\x0e\x10\x02\x06\xc0\xa8\x01\xc8\x27\xd8', b'\x09\x00']
+
+
+class ProfileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, name, data):
+        filename = os.path.join(self.tmp_dir, name)
+        with io.open(filename, 'wb') as fp:
+            fp.write(data)
+        return filename
+
+    def test_load_structure(self):
+        self.assertIsInstance(load_structure('tests.test_conf_struct:DeviceConfStructure'), DeviceConfStructure)
+        self.assertIsInstance(load_structure('tests.test_conf_struct.DeviceConfStructure'), DeviceConfStructure)
+
+    def test_read_frames(self):
+        hex_file = self._write('capture.txt', b'# capture\n0102 00b4\n\n0304 00000e10 0206c0a801c827d8\n0900\n')
+        self.assertEqual(FRAMES, read_frames(hex_file))
+
+        binary_file = self._write('capture.bin', b''.join(struct.pack('>I', len(f)) + f for f in FRAMES))
+        self.assertEqual(FRAMES, read_frames(binary_file, format='binary'))
+
+        with self.assertRaises(ParseException):
+            read_frames(self._write('bad.txt', b'01zz\n'))
+        with self.assertRaises(ParseException):
+            read_frames(self._write('bad.bin', b'\x00\x00\x00\x05\x01'), format='binary')
+
+    def test_report(self):
+        out = io.StringIO()
+        report(DeviceConfStructure(), FRAMES, repeat=1, limit=5, out=out)
+        text = out.getvalue()
+        self.assertIn('Frames: 3 (20 bytes, 1 parse errors)', text)
+        self.assertIn('frames/s', text)
+        self.assertIn('server_address', text)
+        self.assertIn('cProfile', text)
+
+    @unittest.skipIf(tracemalloc is None, 'tracemalloc is not available')
+    def test_measure_allocations(self):
+        dcs = DeviceConfStructure()
+        frames = FRAMES[:2] * 100
+        values_list = [dcs.parse(frame) for frame in frames]
+        stats = measure_allocations(dcs, frames, values_list)
+        # 200 parsed dicts and 200 built frames at least
+        self.assertGreaterEqual(stats.result_blocks, 400)
+        self.assertGreater(stats.peak_bytes, stats.retained_bytes)
+        self.assertLess(stats.retained_blocks, stats.result_blocks)
+
+    def test_main(self):
+        hex_file = self._write('capture.txt', b'0102 00b4\n')
+        out = io.StringIO()
+        main(['tests.test_conf_struct:DeviceConfStructure', hex_file, '--repeat', '1'], out=out)
+        text = out.getvalue()
+        self.assertIn('Structure: tests.test_conf_struct.DeviceConfStructure', text)
+        self.assertIn('Frames: 1 (4 bytes, 0 parse errors)', text)
+        self.assertIn('delayed_restart', text)
+        self.assertIn('cProfile', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# coding=utf8
+
+from __future__ import unicode_literals
+
+import multiprocessing
+import unittest
+
+from conf_struct import ParseException
+from conf_struct.ring import FrameRingBuffer, shared_memory
+
+from tests.test_conf_struct import DeviceConfStructure
+
+FRAME1 = b'\x01\x02\x00\xb4\x03\x04\x00\x00\x0e\x10'
+FRAME2 = b'\x02\x06\xc0\xa8\x01\xc8\x27\xd8'
+VALUES1 = {'delayed_restart': 180, 'awaken_period': 3600}
+VALUES2 = {'server_address': '192.168.1.200:10200'}
+
+
+def _worker(ring, count, queue):
+    dcs = DeviceConfStructure()
+    results = []
+    while len(results) < count:
+        results.extend(ring.consume(dcs))
+    ring.close()
+    queue.put(results)
+
+
+@unittest.skipIf(shared_memory is None, 'multiprocessing.shared_memory is not available')
+class FrameRingBufferTestCase(unittest.TestCase):
+    def setUp(self):
+        self.ring = FrameRingBuffer(capacity=64)
+
+    def tearDown(self):
+        self.ring.close()
+        self.ring.unlink()
+
+    def test_put_consume(self):
+        dcs = DeviceConfStructure()
+        self.assertTrue(self.ring.put(FRAME1))
+        self.assertEqual(2, self.ring.put_many([FRAME2, FRAME1]))
+        self.assertEqual([VALUES1, VALUES2], list(self.ring.consume(dcs, max_frames=2)))
+        self.assertEqual([VALUES1], list(self.ring.consume(dcs)))
+        self.assertEqual([], list(self.ring.consume(dcs)))
+        self.assertEqual(0, self.ring.pending_bytes)
+
+    def test_full_and_wrap(self):
+        frames = [FRAME1, FRAME2] * 20
+        received = []
+        while frames:
+            count = self.ring.put_many(frames)
+            self.assertGreater(count, 0)
+            frames = frames[count:]
+            received.extend(bytes(view) for view in self.ring.iter_frames())
+        self.assertEqual([FRAME1, FRAME2] * 20, received)
+        while self.ring.put(FRAME1):
+            pass
+        self.assertFalse(self.ring.put(FRAME1))
+        with self.assertRaises(ValueError):
+            self.ring.put(b'\x00' * 61)
+
+    def test_parse_error(self):
+        dcs = DeviceConfStructure()
+        self.ring.put_many([FRAME1, b'\x09\x00', FRAME2])
+        consumer = self.ring.consume(dcs)
+        self.assertEqual(VALUES1, next(consumer))
+        with self.assertRaises(ParseException):
+            next(consumer)
+        # The invalid frame is released
+        self.assertEqual([VALUES2], list(self.ring.consume(dcs)))
+
+    def test_attach(self):
+        other = FrameRingBuffer(name=self.ring.name, lock=self.ring._lock)
+        self.assertEqual(64, other.capacity)
+        self.ring.put(FRAME2)
+        self.assertEqual([VALUES2], list(other.consume(DeviceConfStructure())))
+        other.close()
+
+    def test_process(self):
+        for method in ('fork', 'spawn'):
+            if method in multiprocessing.get_all_start_methods():
+                self._run_process(multiprocessing.get_context(method))
+
+    def _run_process(self, context):
+        ring = FrameRingBuffer(capacity=1024, lock=context.Lock())
+        queue = context.Queue()
+        worker = context.Process(target=_worker, args=(ring, 200, queue))
+        worker.start()
+        frames = [FRAME1, FRAME2] * 100
+        while frames:
+            frames = frames[ring.put_many(frames):]
+        results = queue.get(timeout=30)
+        worker.join(timeout=30)
+        ring.close()
+        ring.unlink()
+        self.assertEqual([VALUES1, VALUES2] * 100, results)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+# coding=utf8
+
+from __future__ import unicode_literals
+
+import os
+import random
+import struct
+import timeit
+import unittest
+
+from conf_struct import ConfStructure, COptions, SingleField, SequenceField, DictionaryField, ConstructorField
+from conf_struct.exts import CIPv4Port
+from conf_struct.structures import _speedups
+
+from tests.test_fuzz import outcome, random_frame
+
+
+class PlainStructure(ConfStructure):
+    s1 = SingleField(code=0x01, format='>B')
+    s2 = SingleField(code=0x02, format='>H')
+    s3 = SingleField(code=0x03, format='<i')
+    s4 = SingleField(code=0x04, format='>q')
+    q1 = SequenceField(code=0x05, format='>BH')
+    q2 = SequenceField(code=0x06, format='>3s')
+    d1 = DictionaryField(code=0x07, format='>BB', field_names=['x', 'y'])
+    c1 = ConstructorField(code=0x08, constructor=CIPv4Port())
+    e1 = ConstructorField(code=0x09)
+
+    def parse_e1(self, binary):
+        return binary
+
+    def build_e1(self, value):
+        return value
+
+
+PLAIN_VALUES = {
+    's1': 3, 's2': 7, 's3': -2, 's4': 1 << 40, 'q1': (1, 2), 'q2': ('abc',),
+    'd1': {'x': 1, 'y': 2}, 'c1': '192.168.1.200:10200', 'e1': b'raw'
+}
+
+
+class WideStructure(ConfStructure):
+    s1 = SingleField(code=0x0101, format='>B')
+    s2 = SingleField(code=0x0102, format='>H')
+    q1 = SequenceField(code=0x0105, format='<BH')
+    d1 = DictionaryField(code=0x0107, format='>BB', field_names=['x', 'y'])
+
+    class Options(COptions):
+        code_format = '<H'
+        length_format = '<H'
+
+
+@unittest.skipIf(_speedups is None, 'C accelerator is not built')
+class SpeedupsTestCase(unittest.TestCase):
+    def test_enabled(self):
+        self.assertIsNotNone(PlainStructure._header_layout)
+        self.assertIsNotNone(WideStructure._header_layout)
+
+    def test_parse_fuzz(self):
+        rnd = random.Random(20181019)
+        for structure in (PlainStructure(), WideStructure()):
+            for _ in range(3000):
+                frame = random_frame(rnd, structure)
+                self.assertEqual(outcome(structure._parse_python, frame), outcome(structure.parse, frame), frame)
+
+    def test_round_trip(self):
+        cases = [
+            (PlainStructure(), dict(PLAIN_VALUES, s2=0)),
+            (WideStructure(), {'s1': 3, 's2': 0, 'q1': (1, 2), 'd1': {'x': 1, 'y': 2}}),
+        ]
+        for structure, values in cases:
+            binary = structure.build(**values)
+            self.assertEqual(structure._parse_python(binary), structure.parse(binary))
+
+    def test_native_header(self):
+        class NativeStructure(ConfStructure):
+            a = SingleField(code=0x01, format='>B')
+
+            class Options(COptions):
+                code_format = 'H'
+                length_format = '=H'
+
+        ns = NativeStructure()
+        binary = ns.build(a=5)
+        self.assertEqual(struct.pack('HH', 1, 1) + b'\x05', binary)
+        self.assertEqual({'a': 5}, ns.parse(binary))
+        self.assertEqual(ns._parse_python(binary), ns.parse(binary))
+
+    def test_overridden_offset(self):
+        class SwappedOptions(COptions):
+            @property
+            def code_offset(self):
+                return 1
+
+            @property
+            def length_offset(self):
+                return 0
+
+        class SwappedStructure(ConfStructure):
+            a = SingleField(code=0x01, format='>B')
+            Options = SwappedOptions
+
+        self.assertIsNone(SwappedStructure._header_layout)
+
+    def test_char_fields(self):
+        class CharStructure(ConfStructure):
+            a = SingleField(code=0x01, format='c')
+            b = SequenceField(code=0x02, format='>cB')
+
+        cs = CharStructure()
+        binary = b'\x01\x01a\x02\x02b\x05'
+        self.assertEqual({'a': 'a', 'b': ('b', 5)}, cs.parse(binary))
+        self.assertEqual(cs._parse_python(binary), cs.parse(binary))
+
+    def test_build(self):
+        rnd = random.Random(20181019)
+        ps = PlainStructure()
+        names = sorted(PLAIN_VALUES)
+        for _ in range(500):
+            values = dict((name, PLAIN_VALUES[name]) for name in rnd.sample(names, rnd.randint(0, len(names))))
+            if 'e1' in values:
+                values['e1'] = b'x' * rnd.choice([0, 1, 4, 255])
+            if 'q2' in values:
+                values['q2'] = (rnd.choice(['', 'a', 'abc']),)
+            self.assertEqual(ps._build_python(values), ps.build(**values), values)
+        ws = WideStructure()
+        self.assertEqual(ws._build_python({'s1': 3, 'q1': (1, 2)}), ws.build(s1=3, q1=(1, 2)))
+
+    def test_build_overflow(self):
+        class BadCodeStructure(ConfStructure):
+            e1 = ConstructorField(code=0x100)
+
+            def build_e1(self, value):
+                return value
+
+        for structure, values in ((PlainStructure(), {'e1': b'x' * 256}), (BadCodeStructure(), {'e1': b'x'})):
+            with self.assertRaises(struct.error):
+                structure.build(**values)
+            with self.assertRaises(struct.error):
+                structure._build_python(values)
+
+    def test_build_bytes_like(self):
+        class HookStructure(ConfStructure):
+            e1 = ConstructorField(code=0x01)
+
+            def build_e1(self, value):
+                return value
+
+        hs = HookStructure()
+        self.assertEqual(b'\x01\x02ab', hs.build(e1=bytearray(b'ab')))
+        self.assertEqual(b'\x01\x02ab', hs.build(e1=memoryview(b'ab')))
+        for structure_build in (hs.build, lambda **values: hs._build_python(values)):
+            with self.assertRaises(TypeError):
+                structure_build(e1=[1, 2])
+
+    @unittest.skipUnless(os.environ.get('CONF_STRUCT_TIMING_TESTS') == '1', 'Set CONF_STRUCT_TIMING_TESTS=1 to run')
+    def test_build_time(self):
+        """The C header path must not be slower than the python plan walk."""
+        ps = PlainStructure()
+
+        def best(func):
+            return min(timeit.repeat(func, number=2000, repeat=7))
+
+        c_time = best(lambda: ps.build(**PLAIN_VALUES))
+        python_time = best(lambda: ps._build_python(PLAIN_VALUES))
+        self.assertLess(c_time, python_time * 1.1, 'C {:.6f}s python {:.6f}s'.format(c_time, python_time))
+
+
+if __name__ == '__main__':
+    unittest.main()